@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -39,14 +39,41 @@ class Settings(BaseSettings):
     preview_frame_width: int = Field(640, description="Preview width for MJPEG streaming")
     preview_frame_height: int = Field(480, description="Preview height for MJPEG streaming")
     preview_fps: int = Field(15, description="Target FPS for preview stream")
+    preview_jpeg_quality: int = Field(
+        70, ge=1, le=100, description="JPEG quality for preview frames (lowered automatically for slow clients)"
+    )
 
     mediapipe_stride: int = Field(3, description="Stride used by MediaPipe liveness worker")
     mediapipe_confidence: float = Field(0.6, description="Minimum face detector confidence")
+    mediapipe_detection_interval: int = Field(
+        1, ge=1, description="Run face detection every N frames, reusing the last face in between"
+    )
+    mediapipe_downscale: int = Field(
+        1, ge=1, description="Downscale factor applied to frames before MediaPipe inference (1 = full resolution)"
+    )
+    mediapipe_refine_landmarks: bool = Field(
+        True, description="Run FaceMesh eye/lip refinement (disable on slow CPUs to roughly halve mesh cost)"
+    )
+    opencv_threads: Optional[int] = Field(
+        None, ge=0, description="Cap OpenCV's internal thread pool (e.g. 2 on a 4-core Jetson; unset = OpenCV default)"
+    )
     stability_seconds: float = Field(4.0, description="Duration the user must stay stable")
 
     realsense_enable_hardware: bool = Field(
         False, description="Enable RealSense hardware pipeline (set True on Jetson with camera attached)"
     )
+    realsense_worker_cpus: Optional[List[int]] = Field(
+        None,
+        description=(
+            "CPU cores to pin the RealSense/MediaPipe worker thread to, e.g. [2, 3] (Linux only; unset = no "
+            "pinning). MediaPipe's graph threads and the FaceMesh pool thread inherit this mask, so give it at "
+            "least two cores or face detection and mesh can no longer overlap"
+        ),
+    )
+    realsense_warm_seconds: float = Field(
+        10.0,
+        description="Seconds to keep MediaPipe models loaded after a session ends (0 = close immediately)",
+    )
 
     log_level: str = Field("INFO", description="Logging level for controller")
 
@@ -1,6 +1,7 @@
 """FastAPI entry-point for the mdai controller."""
 from __future__ import annotations
 
+import gc
 from typing import AsyncIterator
 
 from fastapi import Body, FastAPI, WebSocket, WebSocketDisconnect
@@ -10,6 +11,7 @@ from fastapi.responses import JSONResponse, StreamingResponse
 
 from .config import Settings, get_settings
 from .logging_config import configure_logging
+from .sensors.realsense import PREVIEW_BOUNDARY
 from .session_manager import SessionManager
 
 settings: Settings = get_settings()
@@ -29,6 +31,9 @@ app.add_middleware(
 @app.on_event("startup")
 async def on_startup() -> None:
     await manager.start()
+    # Startup allocations (app, settings, clients) live for the whole process; freezing them keeps
+    # later collections from re-scanning them while sessions are streaming frames.
+    gc.freeze()
 
 
 @app.on_event("shutdown")
@@ -70,18 +75,12 @@ async def debug_app_ready(payload: dict[str, str] | None = Body(default=None)) -
 
 @app.get("/preview")
 async def preview_stream() -> StreamingResponse:
-    boundary = "frame"
-
     async def frame_iterator() -> AsyncIterator[bytes]:
-        async for frame in manager.preview_frames():
-            header = (
-                f"--{boundary}\r\n"
-                f"Content-Type: image/jpeg\r\n"
-                f"Content-Length: {len(frame)}\r\n\r\n"
-            ).encode("ascii")
-            yield header + frame + b"\r\n"
-
-    media_type = f"multipart/x-mixed-replace; boundary={boundary}"
+        # Frames arrive as complete multipart parts shared by all subscribers; write them verbatim.
+        async for part in manager.preview_frames():
+            yield part
+
+    media_type = f"multipart/x-mixed-replace; boundary={PREVIEW_BOUNDARY}"
     return StreamingResponse(frame_iterator(), media_type=media_type)
 
 
@@ -2,13 +2,21 @@
 from __future__ import annotations
 
 import asyncio
-from asyncio import QueueEmpty
 import base64
+import concurrent.futures
+import gc
 import logging
-from typing import AsyncIterator, List, Optional
+import os
+import queue
+import threading
+from collections import deque
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple, TypeVar
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 try:  # pragma: no cover - optional dependency
     from d435i.mediapipe_liveness import LivenessConfig, LivenessResult, MediaPipeLiveness
 except Exception:  # noqa: BLE001 - broad to avoid hardware import failures during dev
@@ -16,22 +24,236 @@ except Exception:  # noqa: BLE001 - broad to avoid hardware import failures duri
     LivenessConfig = None
     LivenessResult = None
 
+try:  # pragma: no cover - optional dependency
+    from turbojpeg import TJPF_BGR, TurboJPEG
+
+    # SIMD libjpeg-turbo encoder; TurboJPEG() raises if the shared library is missing.
+    _TURBOJPEG: Optional[TurboJPEG] = TurboJPEG()
+except Exception:  # noqa: BLE001 - fall back to cv2.imencode
+    TJPF_BGR = None
+    _TURBOJPEG = None
+
+# Preview JPEG quality ladder below the configured top quality; the encoder steps down while
+# preview clients fall behind.
+_JPEG_QUALITY_STEPS = (50, 30)
+# Consecutive frames every client keeps up with before quality steps back up.
+_JPEG_RECOVERY_FRAMES = 15
+
 _PLACEHOLDER_JPEG = base64.b64decode(
     b"/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/2wBDAQkJCQwLDBgNDRgyIRwhMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjL/wAARCAABAAEDASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwD5/ooooA//2Q=="
 )
 
+PREVIEW_BOUNDARY = "frame"
+
+
+def _multipart_part(jpeg: bytes) -> bytes:
+    """Wrap one JPEG as a complete ``multipart/x-mixed-replace`` part, ready to write verbatim."""
+
+    header = b"--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % (
+        PREVIEW_BOUNDARY.encode("ascii"),
+        len(jpeg),
+    )
+    return b"".join((header, jpeg, b"\r\n"))
+
+
+_PLACEHOLDER_PART = _multipart_part(_PLACEHOLDER_JPEG)
+
+
+class _FrameBroadcast:
+    """Latest preview frame shared by every reader, tagged with a version counter.
+
+    Publishing is O(1) regardless of the reader count: one value, one version bump and one
+    event wake-up. Readers remember the last version they took, so a reader that is still busy
+    when frames arrive simply skips to the newest one.
+    """
+
+    __slots__ = ("_value", "_version", "_event")
+
+    def __init__(self) -> None:
+        self._value: bytes = b""
+        self._version = 0
+        self._event = asyncio.Event()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def publish(self, value: bytes) -> None:
+        self._value = value
+        self._version += 1
+        # set() resolves every pending waiter; clearing straight away re-arms the event.
+        self._event.set()
+        self._event.clear()
+
+    async def next_after(self, seen: int) -> Tuple[bytes, int]:
+        """Return the latest frame and its version once one newer than ``seen`` exists."""
+
+        while self._version == seen:
+            await self._event.wait()
+        return self._value, self._version
+
+
+class _PreviewReader:
+    __slots__ = ("seen",)
+
+    def __init__(self, seen: int) -> None:
+        self.seen = seen
+
+
+class _RingSubscriber:
+    """Bounded drop-oldest buffer of results plus a single "data available" event."""
+
+    __slots__ = ("buffer", "event")
+
+    def __init__(self, maxlen: int) -> None:
+        self.buffer: deque[Optional[LivenessResult]] = deque(maxlen=maxlen)
+        self.event = asyncio.Event()
+
+    def push(self, item: Optional[LivenessResult]) -> None:
+        self.buffer.append(item)
+        self.event.set()
+
+
+def _resolve(future: asyncio.Future, result: object, error: Optional[BaseException]) -> None:
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _HardwareWorker:
+    """Long-lived thread that owns every call into the RealSense/MediaPipe pipeline.
+
+    Jobs run strictly in submission order, so a close queued after a process call can never
+    overtake it and the pipeline does not need an asyncio lock around each frame. Must be
+    created on the event loop that submits to it; results are delivered back to that loop.
+    """
+
+    def __init__(self, name: str = "realsense-worker", cpus: Optional[Iterable[int]] = None) -> None:
+        # Threads started from this one (MediaPipe graph, FaceMesh pool) inherit the mask.
+        self._cpus = frozenset(cpus) if cpus else None
+        self._loop = asyncio.get_running_loop()
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[], T]) -> asyncio.Future[T]:
+        loop = self._loop
+        future = loop.create_future()
+        self._jobs.put((loop, future, fn))
+        return future
+
+    def stop(self) -> None:
+        self._jobs.put(None)
+
+    def _pin(self) -> None:
+        if self._cpus is None:
+            return
+        if not hasattr(os, "sched_setaffinity"):
+            logger.warning("CPU pinning not supported on this platform; worker left unpinned")
+            return
+        try:
+            # pid 0 targets the calling thread, not the whole process.
+            os.sched_setaffinity(0, self._cpus)
+        except OSError as exc:
+            logger.warning("Failed to pin RealSense worker to CPUs %s: %s", sorted(self._cpus), exc)
+            return
+        logger.info("RealSense worker pinned to CPUs %s", sorted(os.sched_getaffinity(0)))
+
+    def _run(self) -> None:
+        self._pin()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            loop, future, fn = job
+            try:
+                result, error = fn(), None
+            except Exception as exc:  # noqa: BLE001 - handed back to the awaiting coroutine
+                result, error = None, exc
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:  # pragma: no cover - loop already closed during shutdown
+                pass
+
 
 class RealSenseService:
     """Coordinates preview streaming and liveness evaluation."""
 
-    def __init__(self, *, enable_hardware: bool = True, liveness_config: Optional[dict] = None) -> None:
+    __slots__ = (
+        "enable_hardware",
+        "_liveness_config",
+        "_instance",
+        "_warm_instance",
+        "_warm_seconds",
+        "_idle_close_task",
+        "_hardware_active",
+        "_lock",
+        "_worker_cpus",
+        "_preview_interval",
+        "_preview_size",
+        "_resize_buf",
+        "_worker",
+        "_capture_worker",
+        "_prefetch",
+        "_encode_pool",
+        "_jpeg_qualities",
+        "_jpeg_step",
+        "_jpeg_clean_frames",
+        "_preview",
+        "_preview_subscribers",
+        "_result_subscribers",
+        "_loop",
+        "_loop_task",
+        "_stop_event",
+    )
+
+    def __init__(
+        self,
+        *,
+        enable_hardware: bool = True,
+        liveness_config: Optional[dict] = None,
+        worker_cpus: Optional[Iterable[int]] = None,
+        preview_fps: float = 15.0,
+        preview_size: Optional[Tuple[int, int]] = None,
+        jpeg_quality: int = 70,
+        warm_seconds: float = 10.0,
+    ) -> None:
         self.enable_hardware = enable_hardware and MediaPipeLiveness is not None
-        self._liveness_config = liveness_config or {}
+        # Resolved once; every activation reuses the same (read-only) config object.
+        self._liveness_config: Optional[LivenessConfig] = (
+            LivenessConfig(**(liveness_config or {})) if self.enable_hardware else None
+        )
         self._instance: Optional[MediaPipeLiveness] = None
+        # After a session the instance (and its loaded models) is kept for ``warm_seconds`` so a
+        # quick follow-up session skips graph construction; the camera itself is stopped.
+        self._warm_instance: Optional[MediaPipeLiveness] = None
+        self._warm_seconds = warm_seconds
+        self._idle_close_task: Optional[asyncio.Task[None]] = None
         self._hardware_active = False
         self._lock = asyncio.Lock()
-        self._preview_subscribers: list[asyncio.Queue[bytes]] = []
-        self._result_subscribers: list[asyncio.Queue[Optional[LivenessResult]]] = []
+        self._worker_cpus = worker_cpus
+        self._preview_interval = 1.0 / max(preview_fps, 1.0)
+        # (width, height) for the MJPEG feed; larger frames are downscaled before encoding.
+        self._preview_size = preview_size
+        # Downscale target reused by the (single) encoder thread; cv2 reallocates on shape change.
+        self._resize_buf = None
+        self._worker: Optional[_HardwareWorker] = None
+        # Frame acquisition (wait + align) runs one frame ahead on its own thread.
+        self._capture_worker: Optional[_HardwareWorker] = None
+        self._prefetch: Optional[asyncio.Future] = None
+        self._encode_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._jpeg_qualities = (jpeg_quality,) + tuple(q for q in _JPEG_QUALITY_STEPS if q < jpeg_quality)
+        self._jpeg_step = 0
+        self._jpeg_clean_frames = 0
+        # Immutable snapshots, replaced on (un)subscribe, so broadcasts iterate them without copying.
+        self._preview = _FrameBroadcast()
+        self._preview_subscribers: tuple[_PreviewReader, ...] = ()
+        self._result_subscribers: tuple[_RingSubscriber, ...] = ()
+        # Event loop that owns the service, captured in start() for the per-frame paths.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self._loop_task: Optional[asyncio.Task[None]] = None
         self._stop_event = asyncio.Event()
 
@@ -42,7 +264,9 @@ class RealSenseService:
             logger.warning("RealSense hardware disabled – using placeholder frames")
         else:
             logger.info("RealSense hardware idle until session start")
+        self._loop = asyncio.get_running_loop()
         self._stop_event.clear()
+        self._encode_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="realsense-jpeg")
         self._loop_task = asyncio.create_task(self._preview_loop(), name="realsense-preview-loop")
 
     async def stop(self) -> None:
@@ -52,16 +276,32 @@ class RealSenseService:
         await self._loop_task
         self._loop_task = None
         await self.set_hardware_active(False)
+        async with self._lock:
+            await self._close_warm_instance()
+        if self._encode_pool:
+            self._encode_pool.shutdown(wait=False)
+            self._encode_pool = None
+        if self._worker:
+            self._worker.stop()
+            self._worker = None
+        if self._capture_worker:
+            self._capture_worker.stop()
+            self._capture_worker = None
 
     async def preview_stream(self) -> AsyncIterator[bytes]:
-        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=2)
-        self._preview_subscribers.append(queue)
+        """Yield preview frames as preformed multipart parts (see ``PREVIEW_BOUNDARY``).
+
+        Each part is built once per frame and the same bytes object is shared by every subscriber.
+        """
+
+        reader = _PreviewReader(self._preview.version)
+        self._preview_subscribers += (reader,)
         try:
             while True:
-                frame = await queue.get()
+                frame, reader.seen = await self._preview.next_after(reader.seen)
                 yield frame
         finally:
-            self._preview_subscribers.remove(queue)
+            self._preview_subscribers = tuple(r for r in self._preview_subscribers if r is not reader)
 
     async def gather_results(self, duration: float) -> List[LivenessResult]:
         """Collect liveness results produced by the preview loop for a duration."""
@@ -71,8 +311,8 @@ class RealSenseService:
             await asyncio.sleep(duration)
             return []
 
-        queue: asyncio.Queue[Optional[LivenessResult]] = asyncio.Queue(maxsize=5)
-        self._result_subscribers.append(queue)
+        subscriber = _RingSubscriber(maxlen=5)
+        self._result_subscribers += (subscriber,)
         collected: list[LivenessResult] = []
         loop = asyncio.get_running_loop()
         start = loop.time()
@@ -82,28 +322,49 @@ class RealSenseService:
                 if remaining <= 0:
                     break
                 try:
-                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    await asyncio.wait_for(subscriber.event.wait(), timeout=remaining)
                 except asyncio.TimeoutError:
                     break
-                if item is not None:
-                    collected.append(item)
+                subscriber.event.clear()
+                buffer = subscriber.buffer
+                while buffer:
+                    item = buffer.popleft()
+                    if item is not None:
+                        collected.append(item)
         finally:
-            self._result_subscribers.remove(queue)
+            self._result_subscribers = tuple(s for s in self._result_subscribers if s is not subscriber)
         return collected
 
     async def _preview_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = self._preview_interval
+        process_ewma = 0.0
+        frame_index = 0
         try:
             while not self._stop_event.is_set():
-                result: Optional[LivenessResult]
+                started = loop.time()
+                frame_index += 1
+                result: Optional[LivenessResult] = None
                 if self.enable_hardware and self._hardware_active and self._instance:
-                    result = await self._run_process()
-                    frame_bytes = self._serialize_frame(result)
+                    # Prefetching only pays off when processing fills the frame budget; otherwise
+                    # the prefetched frame would sit out the deadline sleep and arrive stale.
+                    result = await self._run_process(prefetch_next=process_ewma >= interval)
+                    process_ewma = 0.9 * process_ewma + 0.1 * (loop.time() - started)
                 else:
-                    result = None
-                    frame_bytes = self._placeholder_frame()
-                self._broadcast_frame(frame_bytes)
+                    process_ewma = 0.0
+                # When inference persistently overruns the frame budget, only encode every other
+                # frame so the JPEG thread stops competing with MediaPipe for CPU.
+                lagging = process_ewma > 1.5 * interval
+                if self._preview_subscribers and not (lagging and frame_index % 2):
+                    # JPEG encoding is the costliest step after inference; only pay for it
+                    # while someone is watching the MJPEG feed.
+                    # No result (idle, warm-up, timeouts) is the common case: reuse the prebuilt
+                    # placeholder part without touching the encoder thread.
+                    frame = await self._serialize_frame(result) if result else _PLACEHOLDER_PART
+                    self._broadcast_frame(frame)
                 self._broadcast_result(result)
-                await asyncio.sleep(1 / 15)
+                # Sleep to the frame deadline rather than a fixed interval on top of the work.
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
         except asyncio.CancelledError:  # pragma: no cover - cooperative cancel
             raise
         except Exception:  # pragma: no cover - defensive guard
@@ -112,49 +373,82 @@ class RealSenseService:
             self._stop_event.clear()
             logger.info("RealSense preview loop stopped")
 
-    async def _run_process(self) -> Optional[LivenessResult]:
-        if not self._instance:
+    async def _run_process(self, prefetch_next: bool = False) -> Optional[LivenessResult]:
+        instance = self._instance
+        if not instance or not self._worker or not self._capture_worker:
             return None
-        async with self._lock:
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(None, self._instance.process)
+        prefetch = self._prefetch
+        if prefetch is None:
+            prefetch = self._prefetch = self._capture_worker.submit(instance.capture)
+        try:
+            captured = await prefetch
+        finally:
+            # Cleared only once resolved, so deactivation can still see (and wait for) it.
+            if self._prefetch is prefetch:
+                self._prefetch = None
+        if self._instance is not instance:
+            # Deactivated while waiting for the camera; the instance is being closed.
+            return None
+        if prefetch_next:
+            # Fetch and align frame N+1 while MediaPipe works on frame N.
+            self._prefetch = self._capture_worker.submit(instance.capture)
+        return await self._worker.submit(partial(instance.process_frames, captured))
+
+    async def _serialize_frame(self, result: LivenessResult) -> bytes:
+        quality = self._jpeg_qualities[self._jpeg_step]
+        # libjpeg releases the GIL, so encoding on its own thread keeps the event loop responsive.
+        return await self._loop.run_in_executor(self._encode_pool, self._encode_jpeg, result.color_image, quality)
 
-    def _serialize_frame(self, result: Optional[LivenessResult]) -> bytes:
-        if not result:
-            return self._placeholder_frame()
+    def _encode_jpeg(self, image, quality: int) -> bytes:
         try:
             import cv2
 
-            image = result.color_image
-            ret, encoded = cv2.imencode(".jpg", image)
+            size = self._preview_size
+            if size and (image.shape[1] > size[0] or image.shape[0] > size[1]):
+                # The preview is a monitoring feed; liveness always runs on the full frame.
+                image = self._resize_buf = cv2.resize(
+                    image, size, dst=self._resize_buf, interpolation=cv2.INTER_AREA
+                )
+            if _TURBOJPEG is not None:
+                return _multipart_part(_TURBOJPEG.encode(image, quality=quality, pixel_format=TJPF_BGR))
+            ret, encoded = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
             if not ret:
-                return self._placeholder_frame()
-            payload = encoded.tobytes()
+                return _PLACEHOLDER_PART
+            payload = _multipart_part(encoded.data)
         except Exception:  # pragma: no cover - fallback path
             logger.exception("Failed to encode RealSense frame; falling back to placeholder")
-            payload = self._placeholder_frame()
+            payload = _PLACEHOLDER_PART
         return payload
 
-    def _placeholder_frame(self) -> bytes:
-        return _PLACEHOLDER_JPEG
-
     def _broadcast_frame(self, frame: bytes) -> None:
-        for queue in list(self._preview_subscribers):
-            if queue.full():
-                try:
-                    queue.get_nowait()
-                except QueueEmpty:
-                    pass
-            queue.put_nowait(frame)
+        if not self._preview_subscribers:
+            return
+        # A reader that has not taken the previous frame yet is falling behind.
+        version = self._preview.version
+        dropped = any(reader.seen != version for reader in self._preview_subscribers)
+        self._preview.publish(frame)
+        self._adapt_jpeg_quality(dropped)
+
+    def _adapt_jpeg_quality(self, dropped: bool) -> None:
+        if dropped:
+            self._jpeg_clean_frames = 0
+            if self._jpeg_step < len(self._jpeg_qualities) - 1:
+                self._jpeg_step += 1
+                logger.debug("Preview client lagging; JPEG quality -> %s", self._jpeg_qualities[self._jpeg_step])
+            return
+        if self._jpeg_step == 0:
+            return
+        self._jpeg_clean_frames += 1
+        if self._jpeg_clean_frames >= _JPEG_RECOVERY_FRAMES:
+            self._jpeg_clean_frames = 0
+            self._jpeg_step -= 1
+            logger.debug("Preview clients caught up; JPEG quality -> %s", self._jpeg_qualities[self._jpeg_step])
 
     def _broadcast_result(self, result: Optional[LivenessResult]) -> None:
-        for queue in list(self._result_subscribers):
-            if queue.full():
-                try:
-                    queue.get_nowait()
-                except QueueEmpty:
-                    pass
-            queue.put_nowait(result)
+        if not self._result_subscribers:
+            return
+        for subscriber in self._result_subscribers:
+            subscriber.push(result)
 
     async def set_hardware_active(self, active: bool) -> None:
         if not self.enable_hardware:
@@ -165,22 +459,68 @@ class RealSenseService:
                 logger.info("Activating RealSense hardware pipeline")
 
                 def _create() -> MediaPipeLiveness:
-                    return MediaPipeLiveness(
-                        config=LivenessConfig(**self._liveness_config) if self._liveness_config else None
-                    )
+                    return MediaPipeLiveness(config=self._liveness_config)
 
-                loop = asyncio.get_running_loop()
-                self._instance = await loop.run_in_executor(None, _create)
+                if self._worker is None:
+                    self._worker = _HardwareWorker(cpus=self._worker_cpus)
+                if self._capture_worker is None:
+                    self._capture_worker = _HardwareWorker(name="realsense-capture")
+                self._cancel_idle_close()
+                warm, self._warm_instance = self._warm_instance, None
+                if warm is not None:
+                    # Models are still loaded; only the per-session history needs clearing. The
+                    # camera restarts lazily on the first capture.
+                    await self._worker.submit(warm.reset)
+                    self._instance = warm
+                else:
+                    self._instance = await self._worker.submit(_create)
                 self._hardware_active = True
             elif not active and self._hardware_active:
                 logger.info("Deactivating RealSense hardware pipeline")
                 instance = self._instance
                 self._instance = None
                 self._hardware_active = False
-                if instance:
-                    loop = asyncio.get_running_loop()
+                prefetch, self._prefetch = self._prefetch, None
+                if prefetch:
+                    # Let an in-flight capture finish before the pipeline is stopped under it.
+                    try:
+                        await prefetch
+                    except Exception:  # noqa: BLE001 - the frame is discarded either way
+                        logger.debug("Discarding failed prefetch during deactivation", exc_info=True)
+                if instance and self._worker:
+
+                    def _park() -> None:
+                        instance.stop()
+                        # The session just ended and the preview is idle, so this is the cheapest
+                        # moment to reclaim the per-frame MediaPipe/NumPy cycles it left behind.
+                        gc.collect()
+
+                    await self._worker.submit(_park)
+                    if self._warm_seconds > 0:
+                        self._warm_instance = instance
+                        self._idle_close_task = asyncio.create_task(
+                            self._close_when_idle(), name="realsense-idle-close"
+                        )
+                    else:
+                        await self._worker.submit(instance.close)
+
+    async def _close_when_idle(self) -> None:
+        await asyncio.sleep(self._warm_seconds)
+        async with self._lock:
+            # Detach first so _close_warm_instance does not cancel the task running it.
+            self._idle_close_task = None
+            await self._close_warm_instance()
+
+    def _cancel_idle_close(self) -> None:
+        if self._idle_close_task is not None:
+            self._idle_close_task.cancel()
+            self._idle_close_task = None
 
-                    def _close() -> None:
-                        instance.close()
+    async def _close_warm_instance(self) -> None:
+        """Close the kept-warm instance, if any; callers hold ``_lock``."""
 
-                    await loop.run_in_executor(None, _close)
+        self._cancel_idle_close()
+        warm, self._warm_instance = self._warm_instance, None
+        if warm is not None and self._worker:
+            logger.info("Releasing idle MediaPipe liveness instance")
+            await self._worker.submit(warm.close)
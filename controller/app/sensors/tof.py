@@ -31,12 +31,13 @@ class ToFSensor:
 
         self._task: Optional[asyncio.Task[None]] = None
         self._stop_event = asyncio.Event()
-        self._callbacks: list[TriggerCallback] = []
+        # Registration is rare; an immutable tuple can be iterated while a callback registers another.
+        self._callbacks: tuple[TriggerCallback, ...] = ()
         self._is_triggered = False
         self._last_toggle_ts = 0.0
 
     def register_callback(self, callback: TriggerCallback) -> None:
-        self._callbacks.append(callback)
+        self._callbacks = self._callbacks + (callback,)
 
     async def start(self) -> None:
         if self._task:
@@ -68,7 +68,22 @@ class SessionManager:
         )
         self._tof.register_callback(self._handle_tof_trigger)
 
-        self._realsense = RealSenseService(enable_hardware=self.settings.realsense_enable_hardware)
+        self._realsense = RealSenseService(
+            enable_hardware=self.settings.realsense_enable_hardware,
+            liveness_config={
+                "stride": self.settings.mediapipe_stride,
+                "confidence": self.settings.mediapipe_confidence,
+                "detection_interval": self.settings.mediapipe_detection_interval,
+                "mp_downscale": self.settings.mediapipe_downscale,
+                "refine_landmarks": self.settings.mediapipe_refine_landmarks,
+                "opencv_threads": self.settings.opencv_threads,
+            },
+            worker_cpus=self.settings.realsense_worker_cpus,
+            preview_fps=self.settings.preview_fps,
+            preview_size=(self.settings.preview_frame_width, self.settings.preview_frame_height),
+            jpeg_quality=self.settings.preview_jpeg_quality,
+            warm_seconds=self.settings.realsense_warm_seconds,
+        )
         self._http_client = BridgeHttpClient(self.settings)
         self._ws_client = BackendWebSocketClient(self.settings)
 
@@ -261,6 +276,7 @@ class SessionManager:
 
         best_bytes: Optional[bytes] = None
         best_score = -1.0
+        loop = asyncio.get_running_loop()
 
         for result in results:
             if not (result.instant_alive or result.stable_alive):
@@ -277,7 +293,7 @@ class SessionManager:
                     continue
                 best_bytes = encoded
                 best_score = composite
-            now = time.time()
+            now = loop.time()
             if now - self._last_metrics_ts >= 0.2:
                 self._last_metrics_ts = now
                 await self._broadcast(
@@ -9,10 +9,11 @@ import math
 import signal
 import sys
 import time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Deque, Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 import cv2
 import mediapipe as mp
@@ -49,19 +50,25 @@ class LivenessThresholds:
 @dataclass
 class LivenessConfig:
     stride: int = 3
+    depth_stride: Optional[int] = None  # sub-sampling for depth stats; defaults to ``stride``
     confidence: float = 0.6
     fps: float = 5.0
     record_seconds: int = 0
     display: bool = True
     log_to_file: bool = True
     log_path: Path = field(default_factory=lambda: Path("logs/d435i_liveness.log"))
+    use_opencl: bool = False  # route colour conversion through cv2.UMat when OpenCL is present
+    opencv_threads: Optional[int] = None  # cap OpenCV's worker pool (process-wide); None = OpenCV default
+    detection_interval: int = 1  # run FaceDetection every N frames, reusing the last face in between
+    mp_downscale: int = 1  # shrink the MediaPipe input by this factor; landmarks/bboxes are relative
+    # Attention refinement of the eye/lip contours; roughly doubles FaceMesh cost when enabled.
+    refine_landmarks: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class LivenessResult:
-    timestamp: float
+    timestamp: float  # time.monotonic() when the frameset arrived
     color_image: np.ndarray
-    depth_frame: rs.depth_frame
     bbox: Optional[Tuple[int, int, int, int]]
     stats: Optional[Dict[str, float]]
     depth_ok: bool
@@ -94,8 +101,13 @@ class DecisionAccumulator:
     state: bool = False
 
     def update(self, positive: bool) -> Tuple[bool, float]:
-        delta = self.pos_gain if positive else -self.neg_gain
-        self.value = clamp(self.value + delta, 0.0, 1.0)
+        value = self.value + (self.pos_gain if positive else -self.neg_gain)
+        # Inline clamp to [0, 1]; this runs once per frame.
+        if value < 0.0:
+            value = 0.0
+        elif value > 1.0:
+            value = 1.0
+        self.value = value
         if self.state:
             if self.value <= self.off_threshold:
                 self.state = False
@@ -109,93 +121,161 @@ def clamp(val: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, val))
 
 
+def make_bbox_mapper(
+    width: int, height: int, expansion: float = 0.2
+) -> Callable[[object], Optional[Tuple[int, int, int, int]]]:
+    """Specialise detection -> pixel bbox conversion for a fixed frame size.
+
+    The frame size and expansion are bound as closure constants so the per-frame call does
+    no clamp() calls or tuple packing beyond the returned bbox.
+    """
+    scale = 1.0 + expansion
+    max_x = float(width - 1)
+    max_y = float(height - 1)
+    full_w = float(width)
+    full_h = float(height)
+
+    def bbox_for(det) -> Optional[Tuple[int, int, int, int]]:
+        bbox = det.location_data.relative_bounding_box
+        w = bbox.width
+        h = bbox.height
+        if w <= 0 or h <= 0:
+            return None
+        cx = bbox.xmin + w / 2.0
+        cy = bbox.ymin + h / 2.0
+        w *= scale
+        h *= scale
+        x = cx - w / 2.0
+        y = cy - h / 2.0
+
+        fx0 = x * full_w
+        fy0 = y * full_h
+        fx1 = (x + w) * full_w
+        fy1 = (y + h) * full_h
+        x0 = int(0.0 if fx0 < 0.0 else (max_x if fx0 > max_x else fx0))
+        y0 = int(0.0 if fy0 < 0.0 else (max_y if fy0 > max_y else fy0))
+        x1 = int(0.0 if fx1 < 0.0 else (full_w if fx1 > full_w else fx1))
+        y1 = int(0.0 if fy1 < 0.0 else (full_h if fy1 > full_h else fy1))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    return bbox_for
+
+
 def bbox_from_detection(det, width: int, height: int, expansion: float = 0.2) -> Optional[Tuple[int, int, int, int]]:
-    bbox = det.location_data.relative_bounding_box
-    x = bbox.xmin
-    y = bbox.ymin
-    w = bbox.width
-    h = bbox.height
-    if w <= 0 or h <= 0:
-        return None
-    cx = x + w / 2.0
-    cy = y + h / 2.0
-    w *= (1.0 + expansion)
-    h *= (1.0 + expansion)
-    x = cx - w / 2.0
-    y = cy - h / 2.0
-
-    x0 = int(clamp(x * width, 0, width - 1))
-    y0 = int(clamp(y * height, 0, height - 1))
-    x1 = int(clamp((x + w) * width, 0, width))
-    y1 = int(clamp((y + h) * height, 0, height))
-    if x1 <= x0 or y1 <= y0:
-        return None
-    return x0, y0, x1, y1
+    return make_bbox_mapper(width, height, expansion)(det)
+
 
+def _readonly(*arrays: np.ndarray) -> Tuple[np.ndarray, ...]:
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays
 
+
+# Face boxes drift by a few pixels between frames, so a small cache keyed on the sampled ROI
+# shape serves almost every frame. Cached masks are shared and therefore read-only.
+@lru_cache(maxsize=64)
 def _ellipse_masks(shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     h, w = shape
     if h < 2 or w < 2:
-        return (np.zeros(shape, dtype=bool),) * 3
-    ys, xs = np.indices((h, w))
+        return _readonly(np.zeros(shape, dtype=bool)) * 3
     cx = (w - 1) / 2.0
     cy = (h - 1) / 2.0
     rx = max(cx, 1.0)
     ry = max(cy, 1.0)
-    norm = ((xs - cx) / rx) ** 2 + ((ys - cy) / ry) ** 2
+    # Separable terms on 1-D axes, squared in place; only the broadcast sum is a full (h, w) array.
+    dx = np.arange(w, dtype=np.float64)
+    dx -= cx
+    dx /= rx
+    dx *= dx
+    dy = np.arange(h, dtype=np.float64)
+    dy -= cy
+    dy /= ry
+    dy *= dy
+    norm = dx[np.newaxis, :] + dy[:, np.newaxis]
     ellipse = norm <= 1.0
     inner = norm <= 0.5 ** 2
-    outer = (norm > 0.5 ** 2) & ellipse
-    return ellipse, inner, outer
+    outer = ellipse & ~inner
+    return _readonly(ellipse, inner, outer)
+
+
+# Region labels for ellipse pixels: inner core or outer ring, split into left/right halves at
+# w / 2. 0 marks pixels outside the ellipse (never valid, so never counted).
+_INNER_LEFT, _INNER_RIGHT, _OUTER_LEFT, _OUTER_RIGHT = 1, 2, 3, 4
+
+
+@lru_cache(maxsize=64)
+def _region_ids(shape: Tuple[int, int]) -> np.ndarray:
+    """uint8 region label per pixel (see ``_INNER_LEFT`` ... ``_OUTER_RIGHT``)."""
+
+    _, inner, outer = _ellipse_masks(shape)
+    region = np.zeros(shape, dtype=np.uint8)
+    region[inner] = _INNER_LEFT
+    region[outer] = _OUTER_LEFT
+    half = math.ceil(shape[1] / 2)
+    region[:, half:] += (region[:, half:] > 0).view(np.uint8)
+    return _readonly(region)[0]
 
 
 def compute_depth_metrics(
-    depth_frame: rs.depth_frame,
+    depth_image: np.ndarray,
+    depth_scale: float,
     bbox: Tuple[int, int, int, int],
     stride: int,
     thresholds: LivenessThresholds,
 ) -> Tuple[Optional[Dict[str, float]], Optional[MaskInfo]]:
-    depth_image = np.asanyarray(depth_frame.get_data())
     x0, y0, x1, y1 = bbox
-    patch = depth_image[y0:y1, x0:x1]
+    # One strided view: only the sampled pixels are ever read. Everything below stays in raw
+    # uint16 sensor units; only the reduced scalars are converted to metres.
+    patch = depth_image[y0:y1:stride, x0:x1:stride]
     if patch.size == 0:
         return None, None
-    if stride > 1:
-        patch = patch[::stride, ::stride]
-    patch = patch.astype(np.float32)
-    depth_unit = depth_frame.get_units()
-    patch *= depth_unit
 
     ellipse_mask, inner_mask, outer_mask = _ellipse_masks(patch.shape)
     if not ellipse_mask.any():
         return None, None
 
-    valid = (patch > 0) & (patch < thresholds.max_depth_m) & ellipse_mask
+    # Largest raw value strictly below max_depth_m, so the range check stays in uint16.
+    max_raw = min(math.ceil(thresholds.max_depth_m / depth_scale) - 1, np.iinfo(np.uint16).max)
+    # 0 < d <= max_raw as one unsigned compare: d - 1 wraps 0 (no reading) round to 65535.
+    valid = np.less(np.subtract(patch, 1, dtype=np.uint16), max_raw)
+    valid &= ellipse_mask
     samples = patch[valid]
     if samples.size < thresholds.min_samples:
         return None, None
 
+    # Raw depths are integers, so float64 sums and the BLAS dot for the sum of squares are exact
+    # (well below 2**53); mean/std follow from the two moments without std()'s temporaries.
+    count = samples.size
+    samples64 = samples.astype(np.float64)
+    mean_raw = float(samples64.sum()) / count
+    variance_raw = max(float(samples64 @ samples64) / count - mean_raw * mean_raw, 0.0)
     stats: Dict[str, float] = {
-        "count": float(samples.size),
-        "min": float(samples.min()),
-        "max": float(samples.max()),
-        "mean": float(samples.mean()),
-        "stdev": float(samples.std()),
+        "count": float(count),
+        "min": float(samples.min()) * depth_scale,
+        "max": float(samples.max()) * depth_scale,
+        "mean": mean_raw * depth_scale,
+        "stdev": math.sqrt(variance_raw) * depth_scale,
     }
     stats["range"] = stats["max"] - stats["min"]
 
-    def safe_mean(mask: np.ndarray) -> Optional[float]:
-        vals = patch[mask]
-        if vals.size == 0:
+    # One uint8 gather labels every sample; bincount then yields the inner/outer and left/right
+    # sums and counts in a single pass instead of four mask ANDs and four more gathers.
+    region = _region_ids(patch.shape)[valid]
+    counts = np.bincount(region, minlength=5).tolist()
+    sums = np.bincount(region, weights=samples, minlength=5).tolist()
+
+    def region_mean(*labels: int) -> Optional[float]:
+        region_count = sum(counts[label] for label in labels)
+        if region_count == 0:
             return None
-        return float(vals.mean())
+        return sum(sums[label] for label in labels) / region_count * depth_scale
 
-    stats["center_mean"] = safe_mean(inner_mask & valid)
-    stats["outer_mean"] = safe_mean(outer_mask & valid)
-    left_mask = valid & (np.indices(patch.shape)[1] < patch.shape[1] / 2)
-    right_mask = valid & (np.indices(patch.shape)[1] >= patch.shape[1] / 2)
-    stats["left_mean"] = safe_mean(left_mask)
-    stats["right_mean"] = safe_mean(right_mask)
+    stats["center_mean"] = region_mean(_INNER_LEFT, _INNER_RIGHT)
+    stats["outer_mean"] = region_mean(_OUTER_LEFT, _OUTER_RIGHT)
+    stats["left_mean"] = region_mean(_INNER_LEFT, _OUTER_LEFT)
+    stats["right_mean"] = region_mean(_INNER_RIGHT, _OUTER_RIGHT)
 
     mask_info = MaskInfo(bbox=bbox, stride=stride, ellipse_mask=ellipse_mask, inner_mask=inner_mask, outer_mask=outer_mask)
     return stats, mask_info
@@ -250,6 +330,17 @@ def evaluate_depth_profile(stats: Dict[str, float], thresholds: LivenessThreshol
     return True, info
 
 
+def build_mask_info(bbox: Tuple[int, int, int, int], stride: int) -> MaskInfo:
+    x0, y0, x1, y1 = bbox
+    shape = (len(range(y0, y1, stride)), len(range(x0, x1, stride)))
+    ellipse_mask, inner_mask, outer_mask = _ellipse_masks(shape)
+    return MaskInfo(bbox=bbox, stride=stride, ellipse_mask=ellipse_mask, inner_mask=inner_mask, outer_mask=outer_mask)
+
+
+_GRAY_LEVELS = np.arange(256, dtype=np.int64)
+_GRAY_LEVELS_SQ = _GRAY_LEVELS * _GRAY_LEVELS
+
+
 def sample_color_metrics(color_image: np.ndarray, mask: MaskInfo) -> Optional[Dict[str, float]]:
     x0, y0, x1, y1 = mask.bbox
     stride = mask.stride
@@ -259,21 +350,56 @@ def sample_color_metrics(color_image: np.ndarray, mask: MaskInfo) -> Optional[Di
     if stride > 1:
         roi = roi[::stride, ::stride]
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    values = gray[mask.ellipse_mask]
-    if values.size == 0:
+    # One 256-bin masked histogram (SIMD in OpenCV, no gather) yields every statistic exactly:
+    # integer moments for mean/stdev and bin ranges for the fractions.
+    hist = cv2.calcHist([gray], [0], mask.ellipse_mask.view(np.uint8), [256], [0, 256]).ravel().astype(np.int64)
+    count = int(hist.sum())
+    if count == 0:
         return None
+    total = int(hist @ _GRAY_LEVELS)
+    total_sq = int(hist @ _GRAY_LEVELS_SQ)
     metrics = {
-        "mean": float(values.mean()),
-        "stdev": float(values.std()),
-        "saturation_fraction": float(np.mean(values >= 240)),
-        "dark_fraction": float(np.mean(values <= 30)),
+        "mean": total / count,
+        "stdev": math.sqrt(max(total_sq * count - total * total, 0)) / count,
+        "saturation_fraction": int(hist[240:].sum()) / count,
+        "dark_fraction": int(hist[:31].sum()) / count,
     }
     return metrics
 
 
+class ColorHistory:
+    """Fixed-capacity ring of (timestamp, colour mean) samples used for flicker detection.
+
+    Unused slots carry ``t = -inf`` so they never fall inside a time window.
+    """
+
+    def __init__(self, capacity: int = 180) -> None:
+        self._t = np.full(capacity, -np.inf, dtype=np.float64)
+        self._mean = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, t: float, mean: float) -> None:
+        self._t[self._next] = t
+        self._mean[self._next] = mean
+        self._next = (self._next + 1) % self._t.shape[0]
+        self._size = min(self._size + 1, self._t.shape[0])
+
+    def peak_to_peak(self, now: float, window_s: float) -> float:
+        """Max minus min of the means sampled within ``window_s`` of ``now``; 0.0 below two samples."""
+
+        recent = self._mean[(now - self._t) <= window_s]
+        if recent.size < 2:
+            return 0.0
+        return float(np.ptp(recent))
+
+
 def evaluate_screen_suspect(
     color_metrics: Optional[Dict[str, float]],
-    color_history: Deque[Tuple[float, float]],
+    color_history: ColorHistory,
     now: float,
     thresholds: LivenessThresholds,
 ) -> Tuple[bool, Dict[str, float]]:
@@ -301,8 +427,7 @@ def evaluate_screen_suspect(
         reasons.append("very_dark")
 
     # flicker detection using recent brightness history
-    recent = [val for (t, val) in color_history if now - t <= thresholds.flicker_window_s]
-    flicker_pp = max(recent) - min(recent) if len(recent) >= 2 else 0.0
+    flicker_pp = color_history.peak_to_peak(now, thresholds.flicker_window_s)
     if flicker_pp >= thresholds.color_flicker_peak_to_peak:
         suspicious = True
         reasons.append("flicker")
@@ -317,48 +442,73 @@ def evaluate_screen_suspect(
     return not suspicious, info
 
 
-def _point_from_landmark(landmark, width: int, height: int) -> np.ndarray:
-    return np.array([landmark.x * width, landmark.y * height], dtype=np.float32)
+# FaceMesh indices ordered (top, bottom, left, right) for each aspect ratio, flattened so a
+# single pass over the landmark protobuf fills every point the ratios need.
+_LEFT_EYE_IDX = (159, 145, 33, 133)
+_RIGHT_EYE_IDX = (386, 374, 362, 263)
+_MOUTH_IDX = (13, 14, 78, 308)
+_ASPECT_IDX = _LEFT_EYE_IDX + _RIGHT_EYE_IDX + _MOUTH_IDX
+_NOSE_IDX = 1
 
+# Subset of depth stats worth repeating in the per-frame log line.
+_LOGGED_STAT_KEYS = frozenset({"count", "min", "max", "range", "stdev", "center_mean", "outer_mean"})
 
-def _aspect_ratio(indices: Tuple[int, int, int, int], landmarks, width: int, height: int) -> Optional[float]:
-    top, bottom, left, right = indices
-    top_pt = _point_from_landmark(landmarks.landmark[top], width, height)
-    bottom_pt = _point_from_landmark(landmarks.landmark[bottom], width, height)
-    left_pt = _point_from_landmark(landmarks.landmark[left], width, height)
-    right_pt = _point_from_landmark(landmarks.landmark[right], width, height)
 
-    horizontal = np.linalg.norm(left_pt - right_pt)
-    vertical = np.linalg.norm(top_pt - bottom_pt)
-    if horizontal < 1e-6:
-        return None
-    return float(vertical / horizontal)
+def _landmark_points(
+    landmarks,
+    indices: Tuple[int, ...],
+    width: int,
+    height: int,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Write pixel-space (x, y) of the selected landmarks into ``out``; z is never read."""
+    if out is None:
+        out = np.empty((len(indices), 2), dtype=np.float32)
+    points = landmarks.landmark
+    selected = [points[idx] for idx in indices]
+    # One C-level fill from the protobuf attributes, then a single scale into ``out``.
+    coords = np.fromiter(
+        [value for landmark in selected for value in (landmark.x, landmark.y)],
+        dtype=np.float32,
+        count=2 * len(indices),
+    )
+    np.multiply(coords.reshape(-1, 2), (width, height), out=out, casting="unsafe")
+    return out
+
+
+def _aspect_ratios(points: np.ndarray) -> List[Optional[float]]:
+    """Vertical/horizontal span of each (top, bottom, left, right) group in a (G*4, 2) array."""
+    groups = points.reshape(-1, 4, 2)
+    # [:, 0] = top - bottom, [:, 1] = left - right; one vectorised norm for every group.
+    deltas = groups[:, ::2] - groups[:, 1::2]
+    spans = np.sqrt(np.einsum("gij,gij->gi", deltas, deltas))
+    return [None if horizontal < 1e-6 else float(vertical / horizontal) for vertical, horizontal in spans]
 
 
 def extract_landmark_metrics(
     face_mesh_result,
     width: int,
     height: int,
-    depth_frame: rs.depth_frame,
+    depth_image: np.ndarray,
+    depth_scale: float,
     thresholds: LivenessThresholds,
+    points: Optional[np.ndarray] = None,
 ) -> Optional[Dict[str, float]]:
     if not face_mesh_result.multi_face_landmarks:
         return None
     landmarks = face_mesh_result.multi_face_landmarks[0]
+    points = _landmark_points(landmarks, _ASPECT_IDX, width, height, points)
 
-    left_eye = _aspect_ratio((159, 145, 33, 133), landmarks, width, height)
-    right_eye = _aspect_ratio((386, 374, 362, 263), landmarks, width, height)
+    left_eye, right_eye, mouth_ratio = _aspect_ratios(points)
     eye_ratio = None
     if left_eye is not None and right_eye is not None:
         eye_ratio = (left_eye + right_eye) / 2.0
 
-    mouth_ratio = _aspect_ratio((13, 14, 78, 308), landmarks, width, height)
-
-    nose_idx = 1
-    nose_landmark = landmarks.landmark[nose_idx]
+    nose_landmark = landmarks.landmark[_NOSE_IDX]
     nose_x = int(clamp(nose_landmark.x * width, 0, width - 1))
     nose_y = int(clamp(nose_landmark.y * height, 0, height - 1))
-    nose_depth = depth_frame.get_distance(nose_x, nose_y)
+    # Same value as depth_frame.get_distance(), read from the z16 view already mapped for the frame.
+    nose_depth = float(depth_image[nose_y, nose_x]) * depth_scale
     if nose_depth <= 0 or nose_depth > thresholds.max_depth_m:
         nose_depth = None
 
@@ -370,56 +520,91 @@ def extract_landmark_metrics(
     return metrics
 
 
+class MovementHistory:
+    """Fixed-capacity ring of per-frame movement samples stored field-major (one row per field).
+
+    Missing landmark metrics are stored as NaN; unused slots carry ``t = -inf`` so they never
+    fall inside a time window.
+    """
+
+    T, CENTER_X, CENTER_Y, EYE_RATIO, MOUTH_RATIO, NOSE_DEPTH = range(6)
+
+    def __init__(self, capacity: int = 180) -> None:
+        self._data = np.full((6, capacity), np.nan, dtype=np.float64)
+        self._data[self.T] = -np.inf
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self,
+        t: float,
+        center_x: float,
+        center_y: float,
+        eye_ratio: Optional[float],
+        mouth_ratio: Optional[float],
+        nose_depth: Optional[float],
+    ) -> None:
+        column = self._data[:, self._next]
+        column[self.T] = t
+        column[self.CENTER_X] = center_x
+        column[self.CENTER_Y] = center_y
+        column[self.EYE_RATIO] = np.nan if eye_ratio is None else eye_ratio
+        column[self.MOUTH_RATIO] = np.nan if mouth_ratio is None else mouth_ratio
+        column[self.NOSE_DEPTH] = np.nan if nose_depth is None else nose_depth
+        self._next = (self._next + 1) % self._data.shape[1]
+        self._size = min(self._size + 1, self._data.shape[1])
+
+    def recent(self, now: float, window_s: float) -> np.ndarray:
+        """Columns sampled within ``window_s`` of ``now`` (slot order, not chronological)."""
+
+        return self._data[:, (now - self._data[self.T]) <= window_s]
+
+
 def update_movement_history(
-    history: Deque[Dict[str, float]],
+    history: MovementHistory,
     metrics: Optional[Dict[str, float]],
     bbox: Tuple[int, int, int, int],
     now: float,
     thresholds: LivenessThresholds,
 ) -> None:
     x0, y0, x1, y1 = bbox
-    center_x = (x0 + x1) / 2.0
-    center_y = (y0 + y1) / 2.0
-    entry = {
-        "t": now,
-        "center_x": center_x,
-        "center_y": center_y,
-        "eye_ratio": metrics.get("eye_ratio") if metrics else None,
-        "mouth_ratio": metrics.get("mouth_ratio") if metrics else None,
-        "nose_depth": metrics.get("nose_depth") if metrics else None,
-    }
-    history.append(entry)
-    # prune stale entries beyond window * 1.5 for buffer
-    while history and now - history[0]["t"] > thresholds.movement_window_s * 1.5:
-        history.popleft()
+    metrics = metrics or {}
+    history.append(
+        now,
+        (x0 + x1) / 2.0,
+        (y0 + y1) / 2.0,
+        metrics.get("eye_ratio"),
+        metrics.get("mouth_ratio"),
+        metrics.get("nose_depth"),
+    )
 
 
-def _variation(values: List[float]) -> float:
-    filtered = [v for v in values if v is not None]
-    if len(filtered) < 2:
-        return 0.0
-    return float(max(filtered) - min(filtered))
+def _variations(rows: np.ndarray) -> List[float]:
+    """Per-row max - min ignoring NaN; 0.0 for rows with fewer than two values."""
+    counts = np.count_nonzero(~np.isnan(rows), axis=1)
+    # fmax/fmin skip NaN without the all-NaN warnings nanmax/nanmin would raise.
+    spans = np.fmax.reduce(rows, axis=1) - np.fmin.reduce(rows, axis=1)
+    return np.where(counts >= 2, spans, 0.0).tolist()
 
 
 def movement_liveness_ok(
-    history: Deque[Dict[str, float]],
+    history: MovementHistory,
     now: float,
     thresholds: LivenessThresholds,
 ) -> Tuple[bool, Dict[str, float]]:
-    recent = [entry for entry in history if now - entry["t"] <= thresholds.movement_window_s]
-    if len(recent) < thresholds.min_movement_samples:
-        return False, {"reason": "insufficient_samples", "samples": len(recent)}
-
-    eye_var = _variation([entry["eye_ratio"] for entry in recent])
-    mouth_var = _variation([entry["mouth_ratio"] for entry in recent])
-    nose_var = _variation([entry["nose_depth"] for entry in recent])
-
-    if len(recent) >= 2:
-        cx_vals = [entry["center_x"] for entry in recent]
-        cy_vals = [entry["center_y"] for entry in recent]
-        center_shift = math.hypot(max(cx_vals) - min(cx_vals), max(cy_vals) - min(cy_vals))
-    else:
-        center_shift = 0.0
+    recent = history.recent(now, thresholds.movement_window_s)
+    samples = recent.shape[1]
+    if samples < thresholds.min_movement_samples:
+        return False, {"reason": "insufficient_samples", "samples": samples}
+
+    # Centre rows are never NaN, so their spans are plain peak-to-peak (0.0 below two samples).
+    dx, dy, eye_var, mouth_var, nose_var = _variations(
+        recent[MovementHistory.CENTER_X : MovementHistory.NOSE_DEPTH + 1]
+    )
+    center_shift = math.hypot(dx, dy)
 
     movement = (
         eye_var >= thresholds.min_eye_change
@@ -438,6 +623,10 @@ def movement_liveness_ok(
     return movement, info
 
 
+# Aligned frameset plus the time.monotonic() stamp taken when it was fetched.
+CapturedFrames = Tuple[rs.composite_frame, float]
+
+
 class MediaPipeLiveness:
     """Single-file liveness helper that keeps all state inside one class."""
 
@@ -448,20 +637,40 @@ class MediaPipeLiveness:
     ) -> None:
         self.config = config or LivenessConfig()
         self.thresholds = thresholds or LivenessThresholds()
+        # Each instance owns its graphs: FaceMesh tracks the face between frames, so sharing it
+        # across cameras would interleave their frames and break that tracking.
         self.face_detector = mp.solutions.face_detection.FaceDetection(
             model_selection=1,
             min_detection_confidence=self.config.confidence,
         )
         self.face_mesh = mp.solutions.face_mesh.FaceMesh(
             max_num_faces=1,
-            refine_landmarks=True,
+            refine_landmarks=self.config.refine_landmarks,
             min_detection_confidence=self.config.confidence,
         )
         self.pipe: Optional[rs.pipeline] = None
         self.align_to_color: Optional[rs.align] = None
-        self.color_history: Deque[Tuple[float, float]] = deque(maxlen=180)
-        self.movement_history: Deque[Dict[str, float]] = deque(maxlen=180)
+        self._depth_scale = 0.001
+        self._bbox_for: Optional[Callable[[object], Optional[Tuple[int, int, int, int]]]] = None
+        # (height, width) of the colour stream, which aligned depth frames share; set in start().
+        self._frame_shape: Tuple[int, int] = (480, 640)
+        self._use_umat = False
+        self._rgb_buf: Optional[np.ndarray] = None
+        self._small_buf: Optional[np.ndarray] = None
+        self._depth_stride = self.config.depth_stride or self.config.stride
+        self.color_history = ColorHistory(capacity=180)
+        self.movement_history = MovementHistory(capacity=180)
         self.decision_acc = DecisionAccumulator()
+        # Pixel coordinates for the eye/mouth landmarks, rewritten in place every frame.
+        self._landmark_buf = np.empty((len(_ASPECT_IDX), 2), dtype=np.float32)
+        # Last detection and a frame counter for ``detection_interval``; a miss always re-detects.
+        self._last_detection: Optional[object] = None
+        self._frame_index = 0
+        # FaceMesh runs here while FaceDetection runs on the calling thread; both graphs drop the
+        # GIL inside their TFLite calculators, so a frame costs max(det, mesh) rather than the sum.
+        self._mesh_pool: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mp-face-mesh"
+        )
         self._started = False
         self._closed = False
 
@@ -481,6 +690,19 @@ class MediaPipeLiveness:
             device.get_info(rs.camera_info.name),
             device.get_info(rs.camera_info.serial_number),
         )
+        self._depth_scale = device.first_depth_sensor().get_depth_scale()
+        color_profile = profile.get_stream(rs.stream.color).as_video_stream_profile()
+        self._frame_shape = (color_profile.height(), color_profile.width())
+        self._bbox_for = make_bbox_mapper(color_profile.width(), color_profile.height())
+        if self.config.opencv_threads is not None:
+            # Per-frame resize/cvtColor calls are small; a full-width OpenCV pool only contends
+            # with the MediaPipe threads for cores.
+            cv2.setNumThreads(self.config.opencv_threads)
+        if self.config.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+            self._use_umat = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+            if not self._use_umat:
+                logging.warning("OpenCL requested but unavailable; colour conversion stays on the CPU")
         self.pipe = pipe
         self.align_to_color = rs.align(rs.stream.color)
         self._started = True
@@ -496,6 +718,9 @@ class MediaPipeLiveness:
         if self._closed:
             return
         self.stop()
+        if self._mesh_pool:
+            self._mesh_pool.shutdown(wait=True)
+            self._mesh_pool = None
         if self.face_detector:
             self.face_detector.close()
             self.face_detector = None
@@ -504,6 +729,15 @@ class MediaPipeLiveness:
             self.face_mesh = None
         self._closed = True
 
+    def reset(self) -> None:
+        """Forget per-session history so a kept-warm instance can serve a new session."""
+
+        self.color_history = ColorHistory(capacity=180)
+        self.movement_history = MovementHistory(capacity=180)
+        self.decision_acc = DecisionAccumulator()
+        self._last_detection = None
+        self._frame_index = 0
+
     def __enter__(self) -> "MediaPipeLiveness":
         self.start()
         return self
@@ -511,26 +745,96 @@ class MediaPipeLiveness:
     def __exit__(self, exc_type, exc, tb) -> None:
         self.close()
 
+    def _to_rgb(self, color_image: np.ndarray) -> np.ndarray:
+        scale = self.config.mp_downscale
+        if scale > 1:
+            # Detection and mesh outputs are normalised, so callers keep using full-frame sizes.
+            height, width = color_image.shape[:2]
+            self._small_buf = cv2.resize(
+                color_image, (width // scale, height // scale), dst=self._small_buf, interpolation=cv2.INTER_AREA
+            )
+            color_image = self._small_buf
+        if self._use_umat:
+            # One upload + one readback; MediaPipe's CPU graph needs a host ndarray.
+            return cv2.cvtColor(cv2.UMat(color_image), cv2.COLOR_BGR2RGB).get()
+        # MediaPipe consumes the image synchronously, so one buffer is reused for every frame.
+        if self._rgb_buf is None or self._rgb_buf.shape != color_image.shape:
+            self._rgb_buf = np.empty_like(color_image)
+        return cv2.cvtColor(color_image, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+
     def process(self, timeout_ms: int = 1000) -> Optional[LivenessResult]:
+        return self.process_frames(self.capture(timeout_ms))
+
+    def capture(self, timeout_ms: int = 1000) -> CapturedFrames:
+        """Wait for the newest frameset and align it to colour.
+
+        Only touches the RealSense pipeline, so callers may run it on another thread to fetch
+        frame N+1 while ``process_frames`` is still working on frame N.
+        """
+
         if self._closed:
             raise RuntimeError("MediaPipeLiveness instance already closed")
         if not self._started:
             self.start()
-        if not self.pipe or not self.align_to_color:
+        if not self.pipe or not self.align_to_color or not self._bbox_for:
             raise RuntimeError("MediaPipeLiveness pipeline not started")
 
         frames = self.pipe.wait_for_frames(timeout_ms=timeout_ms)
-        frames = self.align_to_color.process(frames)
+        # If we fell behind, framesets have queued up in the SDK; skip to the newest one so
+        # results never describe a stale frame and the SDK queue is drained.
+        newer = self.pipe.poll_for_frames()
+        while newer:
+            frames = newer
+            newer = self.pipe.poll_for_frames()
+        return self.align_to_color.process(frames), time.monotonic()
+
+    def _detect(self, rgb_image: np.ndarray) -> Tuple[list, object]:
+        """Run FaceDetection (or reuse the cached face) and FaceMesh for one frame.
+
+        The mesh result is None when no face was detected and the mesh was skipped.
+        """
+
+        interval = self.config.detection_interval
+        index = self._frame_index
+        self._frame_index = index + 1
+        if interval > 1 and self._last_detection is not None and index % interval:
+            # The mesh still tracks landmarks every frame, so movement checks see every frame.
+            return [self._last_detection], self.face_mesh.process(rgb_image)
+
+        if self._last_detection is not None:
+            # A face was present last frame, so it very likely still is: run the mesh
+            # speculatively alongside detection.
+            mesh_future = self._mesh_pool.submit(self.face_mesh.process, rgb_image)
+            detection_result = self.face_detector.process(rgb_image)
+            mesh_result = mesh_future.result()
+            detections = detection_result.detections if detection_result and detection_result.detections else []
+        else:
+            # Nobody in view recently: detect first and only pay for the mesh once a face shows up.
+            detection_result = self.face_detector.process(rgb_image)
+            detections = detection_result.detections if detection_result and detection_result.detections else []
+            mesh_result = self.face_mesh.process(rgb_image) if detections else None
+        self._last_detection = max(detections, key=lambda d: d.score[0]) if detections else None
+        return detections, mesh_result
+
+    def process_frames(self, captured: CapturedFrames) -> Optional[LivenessResult]:
+        """Run detection and the liveness checks on a frameset returned by ``capture``."""
+
+        if self._closed:
+            raise RuntimeError("MediaPipeLiveness instance already closed")
+        frames, now = captured
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
         if not depth_frame or not color_frame:
             return None
+        # Buffer-protocol view over the SDK-owned z16 data; stays valid while depth_frame is alive.
+        # Depth is aligned to colour, so both frames have the stream size cached in start().
+        height, width = self._frame_shape
+        depth_image = np.frombuffer(depth_frame.get_data(), dtype=np.uint16).reshape(height, width)
 
         color_image = np.asanyarray(color_frame.get_data())
-        rgb_image = cv2.cvtColor(color_image, cv2.COLOR_BGR2RGB)
+        rgb_image = self._to_rgb(color_image)
 
-        detection_result = self.face_detector.process(rgb_image)
-        mesh_result = self.face_mesh.process(rgb_image)
+        detections, mesh_result = self._detect(rgb_image)
 
         stats: Optional[Dict[str, float]] = None
         mask_info: Optional[MaskInfo] = None
@@ -543,61 +847,65 @@ class MediaPipeLiveness:
         movement_info: Dict[str, float | int | str] = {"reason": "not_evaluated"}
         instant_alive = False
 
-        detections = detection_result.detections if detection_result and detection_result.detections else []
         if detections:
+            log_frames = logging.root.isEnabledFor(logging.INFO)
             det = max(detections, key=lambda d: d.score[0])
-            width = color_frame.get_width()
-            height = color_frame.get_height()
-            bbox_px = bbox_from_detection(det, width, height)
+            bbox_px = self._bbox_for(det)
             if bbox_px:
-                stats, mask_info = compute_depth_metrics(depth_frame, bbox_px, self.config.stride, self.thresholds)
+                stats, mask_info = compute_depth_metrics(
+                    depth_image, self._depth_scale, bbox_px, self._depth_stride, self.thresholds
+                )
                 if stats and mask_info:
                     depth_ok, depth_info = evaluate_depth_profile(stats, self.thresholds)
+                    if mask_info.stride != self.config.stride:
+                        mask_info = build_mask_info(bbox_px, self.config.stride)
                     color_metrics = sample_color_metrics(color_image, mask_info)
-                    now = time.time()
                     if color_metrics:
-                        self.color_history.append((now, color_metrics["mean"]))
+                        self.color_history.append(now, color_metrics["mean"])
                     screen_ok, screen_info = evaluate_screen_suspect(color_metrics, self.color_history, now, self.thresholds)
 
-                    landmark_metrics = extract_landmark_metrics(mesh_result, width, height, depth_frame, self.thresholds)
+                    landmark_metrics = extract_landmark_metrics(
+                        mesh_result, width, height, depth_image, self._depth_scale, self.thresholds, self._landmark_buf
+                    )
                     update_movement_history(self.movement_history, landmark_metrics, bbox_px, now, self.thresholds)
                     movement_ok, movement_info = movement_liveness_ok(self.movement_history, now, self.thresholds)
 
                     instant_alive = depth_ok and screen_ok and movement_ok
-                    logging.info(
-                        "face_detected score=%.3f bbox=%s instant_alive=%s depth=%s screen=%s movement=%s stats=%s",
-                        det.score[0],
-                        bbox_px,
-                        instant_alive,
-                        depth_info,
-                        screen_info,
-                        movement_info,
-                        {k: v for k, v in stats.items() if k in {"count", "min", "max", "range", "stdev", "center_mean", "outer_mean"}},
-                    )
+                    if log_frames:
+                        logging.info(
+                            "face_detected score=%.3f bbox=%s instant_alive=%s depth=%s screen=%s movement=%s stats=%s",
+                            det.score[0],
+                            bbox_px,
+                            instant_alive,
+                            depth_info,
+                            screen_info,
+                            movement_info,
+                            {k: v for k, v in stats.items() if k in _LOGGED_STAT_KEYS},
+                        )
                 else:
                     instant_alive = False
+                    if log_frames:
+                        logging.info(
+                            "face_detected score=%.3f bbox=%s instant_alive=%s reason=no_depth_samples",
+                            det.score[0],
+                            bbox_px,
+                            instant_alive,
+                        )
+            else:
+                instant_alive = False
+                if log_frames:
                     logging.info(
-                        "face_detected score=%.3f bbox=%s instant_alive=%s reason=no_depth_samples",
+                        "face_detected score=%.3f bbox=None instant_alive=False reason=invalid_bbox",
                         det.score[0],
-                        bbox_px,
-                        instant_alive,
                     )
-            else:
-                instant_alive = False
-                logging.info(
-                    "face_detected score=%.3f bbox=None instant_alive=False reason=invalid_bbox",
-                    det.score[0],
-                )
         else:
             instant_alive = False
 
         stable_alive, stability_score = self.decision_acc.update(instant_alive)
-        timestamp = time.time()
 
         return LivenessResult(
-            timestamp=timestamp,
+            timestamp=now,
             color_image=color_image,
-            depth_frame=depth_frame,
             bbox=bbox_px,
             stats=stats,
             depth_ok=depth_ok,
@@ -611,6 +919,19 @@ class MediaPipeLiveness:
             stability_score=stability_score,
         )
 
+# Overlay text, one template per line; filled in a single format_map pass per frame.
+_OVERLAY_LINES = (
+    "live={stable_alive} inst={instant_alive} score={stability_score:.2f}",
+    "range={range:.3f} stdev={stdev:.3f}",
+    "prom={prominence:.3f} ratio={prominence_ratio:.2f} asym={asymmetry:.3f}",
+    "screen={screen} move={move}",
+)
+_OVERLAY_TEMPLATE = "\n".join(_OVERLAY_LINES)
+_OVERLAY_LIVE_COLOR = (0, 230, 0)
+_OVERLAY_NOT_LIVE_COLOR = (0, 0, 220)
+_OVERLAY_DEPTH_DEFAULTS = {"range": 0, "stdev": 0, "prominence": 0, "prominence_ratio": 0, "asymmetry": 0}
+
+
 def draw_overlay(
     image: np.ndarray,
     bbox: Tuple[int, int, int, int],
@@ -622,15 +943,16 @@ def draw_overlay(
     movement_info: Dict[str, float],
 ) -> None:
     x0, y0, x1, y1 = bbox
-    color = (0, 230, 0) if stable_alive else (0, 0, 220)
+    color = _OVERLAY_LIVE_COLOR if stable_alive else _OVERLAY_NOT_LIVE_COLOR
     cv2.rectangle(image, (x0, y0), (x1, y1), color, 2)
 
-    text_lines = [
-        f"live={stable_alive} inst={instant_alive} score={stability_score:.2f}",
-        f"range={depth_info.get('range', 0):.3f} stdev={depth_info.get('stdev', 0):.3f}",
-        f"prom={depth_info.get('prominence', 0):.3f} ratio={depth_info.get('prominence_ratio', 0):.2f} asym={depth_info.get('asymmetry', 0):.3f}",
-        f"screen={screen_info.get('reason', 'n/a')} move={movement_info.get('reason', 'n/a')}",
-    ]
+    values = {**_OVERLAY_DEPTH_DEFAULTS, **depth_info}
+    values["stable_alive"] = stable_alive
+    values["instant_alive"] = instant_alive
+    values["stability_score"] = stability_score
+    values["screen"] = screen_info.get("reason", "n/a")
+    values["move"] = movement_info.get("reason", "n/a")
+    text_lines = _OVERLAY_TEMPLATE.format_map(values).split("\n")
     for idx, line in enumerate(text_lines):
         cv2.putText(
             image,
@@ -647,9 +969,23 @@ def draw_overlay(
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--stride", type=int, default=3, help="Sub-sampling stride for ROI sampling")
+    parser.add_argument("--depth-stride", type=int, default=None, help="Sub-sampling stride for depth stats (defaults to --stride)")
     parser.add_argument("--confidence", type=float, default=0.6, help="Mediapipe detection confidence")
     parser.add_argument("--no-display", action="store_true", help="Disable OpenCV preview window")
     parser.add_argument("--fps", type=float, default=5.0, help="Status log frequency")
+    parser.add_argument(
+        "--detection-interval", type=int, default=1, help="Run face detection every N frames (1 = every frame)"
+    )
+    parser.add_argument(
+        "--mp-downscale", type=int, default=1, help="Downscale factor for MediaPipe input (1 = full resolution)"
+    )
+    parser.add_argument(
+        "--no-refine-landmarks", action="store_true", help="Skip FaceMesh eye/lip refinement (faster, coarser contours)"
+    )
+    parser.add_argument(
+        "--opencv-threads", type=int, default=None, help="Limit OpenCV's internal thread pool (default: OpenCV's choice)"
+    )
+    parser.add_argument("--opencl", action="store_true", help="Use OpenCL (cv2.UMat) for colour conversion when available")
     parser.add_argument("--record", type=int, default=0, help="Optional recording duration in seconds (0 = run until Ctrl+C)")
     return parser.parse_args()
 
@@ -670,10 +1006,16 @@ def main() -> None:
     args = parse_args()
     config = LivenessConfig(
         stride=args.stride,
+        depth_stride=args.depth_stride,
         confidence=args.confidence,
         fps=args.fps,
         record_seconds=args.record,
         display=not args.no_display,
+        use_opencl=args.opencl,
+        detection_interval=max(1, args.detection_interval),
+        mp_downscale=max(1, args.mp_downscale),
+        refine_landmarks=not args.no_refine_landmarks,
+        opencv_threads=args.opencv_threads,
     )
     setup_logging(config)
     thresholds = LivenessThresholds()
@@ -681,11 +1023,16 @@ def main() -> None:
     signal.signal(signal.SIGINT, lambda *_: sys.exit(0))
 
     last_status = 0.0
-    start_time = time.time()
+    start_time = time.monotonic()
+    # Scratch frame for the overlay, reused across iterations; frames without an overlay are
+    # shown straight from the camera buffer.
+    display_buf: Optional[np.ndarray] = None
+    # pollKey (OpenCV >= 4.5.2) pumps window events without waitKey's minimum 1 ms sleep.
+    poll_key = getattr(cv2, "pollKey", None) or (lambda: cv2.waitKey(1))
     try:
         with MediaPipeLiveness(config=config, thresholds=thresholds) as liveness:
             while True:
-                if config.record_seconds and (time.time() - start_time) >= config.record_seconds:
+                if config.record_seconds and (time.monotonic() - start_time) >= config.record_seconds:
                     break
                 try:
                     result = liveness.process(timeout_ms=1000)
@@ -713,8 +1060,12 @@ def main() -> None:
                     last_status = result.timestamp
 
                 if config.display:
-                    display = result.color_image.copy()
+                    display = result.color_image
                     if result.bbox and result.stats:
+                        if display_buf is None or display_buf.shape != display.shape:
+                            display_buf = np.empty_like(display)
+                        np.copyto(display_buf, display)
+                        display = display_buf
                         draw_overlay(
                             display,
                             result.bbox,
@@ -726,7 +1077,7 @@ def main() -> None:
                             result.movement_info,
                         )
                     cv2.imshow("D435i Liveness", display)
-                    if cv2.waitKey(1) & 0xFF == 27:
+                    if poll_key() & 0xFF == 27:
                         break
     finally:
         if config.display: